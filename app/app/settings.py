@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -93,11 +94,23 @@ DATABASES = {
        'NAME' : os.environ.get('DB_NAME'),
        'USER' : os.environ.get('DB_USER'),
        'PASSWORD' : os.environ.get('DB_PASS'),
+       'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
 
     }
 }
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/testing/overview/#password-hashing
+
+TESTING = sys.argv[1:2] == ['test']
+
+if TESTING:
+    PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
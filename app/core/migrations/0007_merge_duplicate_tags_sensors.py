@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-15 20:06
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    """Merge tags and sensors sharing a user and name into one row."""
+    Device = apps.get_model('core', 'Device')
+    for model_name, field_name in (('Tag', 'tags'), ('Sensor', 'sensors')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Device, field_name).through
+        target = f'{model_name.lower()}_id'
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=models.Min('id'),
+            total=models.Count('id'),
+        ).filter(total__gt=1)
+        for duplicate in duplicates:
+            extra = model.objects.filter(
+                user=duplicate['user'],
+                name=duplicate['name'],
+            ).exclude(id=duplicate['keep'])
+            links = through.objects.filter(**{f'{target}__in': extra})
+            through.objects.bulk_create(
+                [
+                    through(device_id=link.device_id,
+                            **{target: duplicate['keep']})
+                    for link in links
+                ],
+                ignore_conflicts=True,
+            )
+            extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_device_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
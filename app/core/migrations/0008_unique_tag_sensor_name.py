@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-15 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_merge_duplicate_tags_sensors'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='sensor',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_sensor_user_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_user_name'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-15 20:11
+
+from django.db import migrations, models
+
+
+def set_assigned(apps, schema_editor):
+    """Flag tags and sensors that are already linked to a device."""
+    Device = apps.get_model('core', 'Device')
+    for model_name, field_name in (('Tag', 'tags'), ('Sensor', 'sensors')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Device, field_name).through
+        links = through.objects.filter(
+            **{model_name.lower(): models.OuterRef('pk')}
+        )
+        model.objects.filter(models.Exists(links)).update(assigned=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unique_tag_sensor_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensor',
+            name='assigned',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='assigned',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.RunPython(set_assigned, migrations.RunPython.noop),
+    ]
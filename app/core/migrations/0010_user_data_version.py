@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-15 21:02
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_tag_sensor_assigned'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='data_version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
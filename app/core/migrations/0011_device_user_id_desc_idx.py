@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-15 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['user', '-id'], name='device_user_id_desc_idx'),
+        ),
+    ]
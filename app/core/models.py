@@ -42,6 +42,10 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def bump_data_version(self, user_id):
+        """Mark a user's devices, tags or sensors as changed."""
+        self.filter(pk=user_id).update(data_version=uuid.uuid4())
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system."""
@@ -49,6 +53,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    data_version = models.UUIDField(default=uuid.uuid4, editable=False)
 
     objects = UserManager()
 
@@ -70,6 +75,14 @@ class Device(models.Model):
     sensors = models.ManyToManyField('Sensor')
     image = models.ImageField(null=True, upload_to=device_image_file_path)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='device_user_id_desc_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -82,6 +95,16 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    assigned = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_user_name',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -94,5 +117,15 @@ class Sensor(models.Model):
         on_delete=models.CASCADE,
     )
 
+    assigned = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_sensor_user_name',
+            ),
+        ]
+
     def __str__(self):
         return self.name
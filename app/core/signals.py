@@ -0,0 +1,107 @@
+"""
+Signal handlers for core models.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import (
+    m2m_changed,
+    pre_delete,
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from core.models import (
+    User,
+    Device,
+    Tag,
+    Sensor,
+)
+
+
+ASSIGNED_RELATIONS = {
+    Tag: 'tags',
+    Sensor: 'sensors',
+}
+
+
+def refresh_assigned(model, pks):
+    """Recompute the assigned flag of tags or sensors from device links."""
+    if not pks:
+        return
+
+    through = getattr(Device, ASSIGNED_RELATIONS[model]).through
+    links = through.objects.filter(
+        **{model._meta.model_name: OuterRef('pk')}
+    )
+    model.objects.filter(pk__in=pks).update(assigned=Exists(links))
+
+
+@receiver(m2m_changed, sender=Device.tags.through)
+@receiver(m2m_changed, sender=Device.sensors.through)
+def update_assigned(sender, instance, action, reverse, model, pk_set,
+                    **kwargs):
+    """Keep the assigned flag in sync when device links change."""
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_assigned(type(instance), [instance.pk])
+        return
+
+    if action == 'pre_clear':
+        related = getattr(instance, ASSIGNED_RELATIONS[model])
+        instance._cleared_pks = list(related.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_assigned(model, instance.__dict__.pop('_cleared_pks', None))
+    elif action in ('post_add', 'post_remove'):
+        refresh_assigned(model, pk_set)
+
+
+@receiver(pre_delete, sender=Device)
+def collect_assigned(sender, instance, **kwargs):
+    """Remember the tags and sensors of a device about to be deleted."""
+    instance._deleted_pks = {
+        model: list(
+            getattr(instance, field_name).values_list('pk', flat=True)
+        )
+        for model, field_name in ASSIGNED_RELATIONS.items()
+    }
+
+
+@receiver(post_delete, sender=Device)
+def release_assigned(sender, instance, **kwargs):
+    """Recompute the assigned flag of a deleted device's tags and sensors."""
+    for model, pks in getattr(instance, '_deleted_pks', {}).items():
+        refresh_assigned(model, pks)
+
+
+def bump_data_version_on_commit(user_id):
+    """Bump a user's data version once when the transaction commits."""
+    connection = transaction.get_connection()
+    for entry in connection.run_on_commit:
+        if getattr(entry[1], 'data_version_user_id', None) == user_id:
+            return
+
+    bump = partial(User.objects.bump_data_version, user_id)
+    bump.data_version_user_id = user_id
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Sensor)
+@receiver(post_delete, sender=Device)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Sensor)
+def bump_on_change(sender, instance, **kwargs):
+    """Invalidate cached lists of the owner of a changed object."""
+    bump_data_version_on_commit(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Device.tags.through)
+@receiver(m2m_changed, sender=Device.sensors.through)
+def bump_on_link_change(sender, instance, action, **kwargs):
+    """Invalidate cached lists when device links change."""
+    if action.startswith('post_'):
+        bump_data_version_on_commit(instance.user_id)
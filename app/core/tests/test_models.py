@@ -10,9 +10,12 @@ from django.contrib.auth import get_user_model
 from core import models
 
 
+User = get_user_model()
+
+
 def create_user(email='user@example.com', password='testpass123'):
     """Create a return a new user."""
-    return get_user_model().objects.create_user(email, password)
+    return User.objects.create_user(email, password)
 
 
 class ModelTests(TestCase):
@@ -22,7 +25,7 @@ class ModelTests(TestCase):
         """Test creating a user with an email is successful."""
         email = 'test@example.com'
         password = 'testpass123'
-        user = get_user_model().objects.create_user(
+        user = User.objects.create_user(
             email=email,
             password=password,
         )
@@ -39,17 +42,17 @@ class ModelTests(TestCase):
             ['test4@example.COM', 'test4@example.com'],
         ]
         for email, expected in sample_emails:
-            user = get_user_model().objects.create_user(email, 'sample123')
+            user = User.objects.create_user(email, 'sample123')
             self.assertEqual(user.email, expected)
 
     def test_new_user_without_email_raises_error(self):
         '''Test that creating a user without an email raises value error'''
         with self.assertRaises(ValueError):
-            get_user_model().objects.create_user('', 'test123')
+            User.objects.create_user('', 'test123')
 
     def test_create_superuser(self):
         """Test creating a superuser."""
-        user = get_user_model().objects.create_superuser(
+        user = User.objects.create_superuser(
             'test@example.com',
             'test123',
         )
@@ -59,7 +62,7 @@ class ModelTests(TestCase):
 
     def test_create_device(self):
         '''Test creating a device is sucessful'''
-        user = get_user_model().objects.create_user(
+        user = User.objects.create_user(
             'test@example.com',
             'testpass123',
         )
@@ -90,6 +93,46 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(sensor), sensor.name)
 
+    def test_tag_assigned_follows_device_links(self):
+        """Test a tag is flagged assigned only while linked to a device."""
+        user = create_user()
+        tag = models.Tag.objects.create(user=user, name='Tag1')
+        device = models.Device.objects.create(
+            user=user,
+            title='Sample device name',
+            time_minutes=5,
+            value=Decimal('5.50'),
+        )
+
+        device.tags.add(tag)
+        tag.refresh_from_db()
+        self.assertTrue(tag.assigned)
+
+        device.tags.clear()
+        tag.refresh_from_db()
+        self.assertFalse(tag.assigned)
+
+        tag.device_set.add(device)
+        tag.refresh_from_db()
+        self.assertTrue(tag.assigned)
+
+    def test_sensor_unassigned_when_device_deleted(self):
+        """Test deleting its only device unassigns a sensor."""
+        user = create_user()
+        sensor = models.Sensor.objects.create(user=user, name='Sensor1')
+        device = models.Device.objects.create(
+            user=user,
+            title='Sample device name',
+            time_minutes=5,
+            value=Decimal('5.50'),
+        )
+        device.sensors.add(sensor)
+
+        device.delete()
+
+        sensor.refresh_from_db()
+        self.assertFalse(sensor.assigned)
+
     @patch('core.models.uuid.uuid4')
     def test_device_file_name_uuid(self, mock_uuid):
         """Test generating image path."""
@@ -0,0 +1,10 @@
+"""
+Pagination classes for the device APIs.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class DeviceCursorPagination(CursorPagination):
+    """Page through devices newest first using the id as cursor."""
+    ordering = '-id'
+    page_size = 50
@@ -0,0 +1,51 @@
+"""
+Renderers for the device APIs.
+"""
+import math
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+def has_non_finite(data):
+    """Return whether data holds a NaN or infinite float."""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(has_non_finite(value) for value in data)
+
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON renderer backed by orjson."""
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into compact JSON bytes."""
+        if data is None:
+            return b''
+        # orjson only writes compact UTF-8 output, so anything else is
+        # left to JSONRenderer.
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=self.options,
+        )
+        # orjson writes NaN and infinity as null; let JSONRenderer raise
+        # or write them according to STRICT_JSON.
+        if b'null' in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer, which escapes these for use in JavaScript.
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028',
+        ).replace(
+            b'\xe2\x80\xa9', b'\\u2029',
+        )
@@ -1,6 +1,13 @@
 """
 Serializers for device APIs
 """
+import copy
+from collections import (
+    defaultdict,
+    OrderedDict,
+)
+
+from django.db.models.signals import m2m_changed
 from rest_framework import serializers
 
 from core.models import (
@@ -10,7 +17,28 @@ from core.models import (
 )
 
 
-class TagSerializer(serializers.ModelSerializer):
+class CachedFieldsMixin:
+    """Build serializer fields once per class and copy them per instance."""
+
+    _fields_cache = {}
+
+    def get_fields(self):
+        """Return copies of the cached fields for this serializer class."""
+        cls = type(self)
+        if cls not in self._fields_cache:
+            self._fields_cache[cls] = super().get_fields()
+
+        return {
+            name: (
+                copy.deepcopy(field)
+                if isinstance(field, serializers.BaseSerializer)
+                else copy.copy(field)
+            )
+            for name, field in self._fields_cache[cls].items()
+        }
+
+
+class TagSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for tags."""
 
     class Meta:
@@ -19,7 +47,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class SensorSerializer(serializers.ModelSerializer):
+class SensorSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for sensors."""
 
     class Meta:
@@ -28,45 +56,88 @@ class SensorSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class DeviceSerializer(serializers.ModelSerializer):
+class DeviceSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for devices."""
 
     tags = TagSerializer(many=True, required=False)
     sensors = SensorSerializer(many=True, required=False)
 
+    # Insert relation rows straight into the through tables, skipping the
+    # existing-row lookup of manager.add(). m2m_changed is still sent.
+    bulk_through_m2m = True
+
     class Meta:
         model = Device
         fields = ['id', 'title', 'time_minutes', 'value', 'link',
                   'tags', 'sensors']
         read_only_fields = ['id']
 
+    def _get_or_create_objs(self, model, items):
+        """Fetch or create tag-like objects in bulk for the auth user."""
+        if not items:
+            return []
+
+        auth_user = self.context['request'].user
+        names = list(dict.fromkeys(item['name'] for item in items))
+        queryset = model.objects.filter(user=auth_user, name__in=names)
+        objs = {obj.name: obj for obj in queryset}
+        missing = [
+            model(user=auth_user, name=name)
+            for name in names if name not in objs
+        ]
+        if missing:
+            model.objects.bulk_create(missing, ignore_conflicts=True)
+            objs = {obj.name: obj for obj in queryset.all()}
+
+        return [objs[name] for name in names]
+
+    def _add_related(self, manager, objs):
+        """Add objects to a device relation."""
+        if not self.bulk_through_m2m:
+            manager.add(*objs)
+            return
+
+        through = manager.through
+        source = f'{manager.source_field_name}_id'
+        target = f'{manager.target_field_name}_id'
+        signal_kwargs = {
+            'sender': through,
+            'instance': manager.instance,
+            'reverse': False,
+            'model': manager.model,
+            'pk_set': {obj.pk for obj in objs},
+            'using': manager.instance._state.db,
+        }
+        m2m_changed.send(action='pre_add', **signal_kwargs)
+        through.objects.bulk_create(
+            [
+                through(**{source: manager.instance.pk, target: obj.pk})
+                for obj in objs
+            ],
+            ignore_conflicts=True,
+        )
+        m2m_changed.send(action='post_add', **signal_kwargs)
+
     def _get_or_create_tags(self, tags, device):
         """Handle getting or creating tags as needed."""
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            device.tags.add(tag_obj)
+        self._add_related(device.tags, self._get_or_create_objs(Tag, tags))
 
     def _get_or_create_sensors(self, sensors, device):
         """Handle getting or creating sensors as needed."""
-        auth_user = self.context['request'].user
-        for sensor in sensors:
-            sensor_obj, created = Sensor.objects.get_or_create(
-                user=auth_user,
-                **sensor,
-            )
-            device.sensors.add(sensor_obj)
+        self._add_related(
+            device.sensors,
+            self._get_or_create_objs(Sensor, sensors),
+        )
 
     def create(self, validated_data):
         """Create a device."""
         tags = validated_data.pop('tags', [])
         sensors = validated_data.pop('sensors', [])
         device = Device.objects.create(**validated_data)
-        self._get_or_create_tags(tags, device)
-        self._get_or_create_sensors(sensors, device)
+        if tags:
+            self._get_or_create_tags(tags, device)
+        if sensors:
+            self._get_or_create_sensors(sensors, device)
 
         return device
 
@@ -75,20 +146,80 @@ class DeviceSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', None)
         sensors = validated_data.pop('sensors', None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            instance.tags.set(self._get_or_create_objs(Tag, tags))
 
         if sensors is not None:
-            instance.sensors.clear()
-            self._get_or_create_sensors(sensors, instance)
+            instance.sensors.set(self._get_or_create_objs(Sensor, sensors))
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        instance.save()
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
         return instance
 
 
+class DeviceValuesListSerializer(serializers.ListSerializer):
+    """Render device rows from values() with their tags and sensors."""
+
+    def to_representation(self, data):
+        """Attach related names to each row in one query per relation."""
+        rows = list(data)
+        if not rows or not isinstance(rows[0], dict):
+            return super().to_representation(rows)
+
+        ids = [row['id'] for row in rows]
+        for name in self.child.nested_fields:
+            field = Device._meta.get_field(name)
+            target = field.m2m_reverse_field_name()
+            links = field.remote_field.through.objects.filter(
+                device_id__in=ids,
+            ).order_by('pk').values_list(
+                'device_id', f'{target}_id', f'{target}__name',
+            )
+            related = defaultdict(list)
+            for device_id, obj_id, obj_name in links:
+                related[device_id].append(
+                    OrderedDict([('id', obj_id), ('name', obj_name)])
+                )
+            for row in rows:
+                row[name] = related[row['id']]
+
+        return [self.child.to_representation(row) for row in rows]
+
+
+class DeviceListSerializer(DeviceSerializer):
+    """Serializer for listing devices."""
+
+    nested_fields = ('tags', 'sensors')
+
+    class Meta(DeviceSerializer.Meta):
+        list_serializer_class = DeviceValuesListSerializer
+
+    def to_representation(self, instance):
+        """Render tags and sensors without nested serializers."""
+        ret = OrderedDict()
+        for field in self._readable_fields:
+            name = field.field_name
+            if name in self.nested_fields:
+                ret[name] = (
+                    instance[name] if isinstance(instance, dict)
+                    else [
+                        OrderedDict([('id', obj.id), ('name', obj.name)])
+                        for obj in getattr(instance, name).all()
+                    ]
+                )
+                continue
+
+            attribute = field.get_attribute(instance)
+            ret[name] = (
+                None if attribute is None
+                else field.to_representation(attribute)
+            )
+
+        return ret
+
+
 class DeviceDetailSerializer(DeviceSerializer):
     """Serializer for device detail view."""
 
@@ -96,11 +227,15 @@ class DeviceDetailSerializer(DeviceSerializer):
         fields = DeviceSerializer.Meta.fields + ['description', 'image']
 
 
-class DeviceImageSerializer(serializers.ModelSerializer):
+class DeviceImageSerializer(CachedFieldsMixin, serializers.Serializer):
     """Serializer for uploading images to devices."""
 
-    class Meta:
-        model = Device
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
+    id = serializers.IntegerField(read_only=True)
+    image = serializers.ImageField(required=True)
+
+    def update(self, instance, validated_data):
+        """Update device image."""
+        instance.image = validated_data['image']
+        instance.save(update_fields=['image'])
+
+        return instance
@@ -3,15 +3,31 @@ Tests for device APIs
 """
 
 from decimal import Decimal
+from functools import lru_cache
+import io
+import json
 import tempfile
+import shutil
 import os
+from unittest.mock import Mock, patch
 
 from PIL import Image
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from django.urls import reverse
+from django.core.cache import cache
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import connection
+from django.db.models.signals import m2m_changed
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
 
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
 from core.models import (
@@ -20,45 +36,86 @@ from core.models import (
     Sensor,
 )
 
+from device.pagination import DeviceCursorPagination
 from device.serializers import (
     DeviceSerializer,
     DeviceDetailSerializer,
+    DeviceImageSerializer,
 )
 
-DEVICES_URL = reverse('device:device-list')
+User = get_user_model()
+
+DEVICES_URL = reverse_lazy('device:device-list')
+
+VALUE_5_25 = Decimal('5.25')
+VALUE_5_99 = Decimal('5.99')
+VALUE_2_50 = Decimal('2.50')
+VALUE_4_50 = Decimal('4.50')
+
+DEVICE_DEFAULTS = {
+    'title': 'Sample device title',
+    'time_minutes': 20,
+    'value': VALUE_5_25,
+    'description': 'celcius',
+    'link': 'http://example.com/device.pdf',
+}
+
+NEW_TAGS_PAYLOAD = {
+    'title': 'DX',
+    'time_minutes': 30,
+    'value': '2.50',
+    'tags': [{'name': 'Cooling device'}, {'name': 'small_unit'}],
+}
+NEW_TAGS_JSON = json.dumps(NEW_TAGS_PAYLOAD)
+
+NEW_SENSORS_PAYLOAD = {
+    'title': 'AHU',
+    'time_minutes': 60,
+    'value': '4.30',
+    'sensors': [{'name': 'temp'}, {'name': 'humidity'}],
+}
+NEW_SENSORS_JSON = json.dumps(NEW_SENSORS_PAYLOAD)
+
+
+@lru_cache(maxsize=None)
+def url_template(name):
+    """Return a format string for the named URL taking one id."""
+    return reverse(name, args=[0]).replace('/0/', '/{}/')
 
 
 def detail_url(device_id):
     """Create and return a device detail URL."""
-    return reverse('device:device-detail', args=[device_id])
+    return url_template('device:device-detail').format(device_id)
 
 
 def image_upload_url(device_id):
     """Create and return an image upload URL."""
-    return reverse('device:device-upload-image', args=[device_id])
+    return url_template('device:device-upload-image').format(device_id)
 
 
 def create_device(user, **params):
     """Create and return a sample device."""
-    defaults = {
-        'title': 'Sample device title',
-        'time_minutes': 20,
-        'value': Decimal('5.25'),
-        'description': 'celcius',
-        'link': 'http://example.com/device.pdf',
-    }
-    defaults.update(params)
+    defaults = {**DEVICE_DEFAULTS, **params}
 
     device = Device.objects.create(user=user, **defaults)
     return device
 
 
+def create_devices(user, n, **params):
+    """Create and return n sample devices in a single query."""
+    defaults = {**DEVICE_DEFAULTS, **params}
+
+    return Device.objects.bulk_create(
+        [Device(user=user, **defaults) for _ in range(n)]
+    )
+
+
 def create_user(**params):
     """Create and return a new user."""
-    return get_user_model().objects.create_user(**params)
+    return User.objects.create_user(**params)
 
 
-class PublicDeviceAPITests(TestCase):
+class PublicDeviceAPITests(SimpleTestCase):
     """Test unauthenticated API requests."""
 
     def setUp(self):
@@ -74,22 +131,29 @@ class PublicDeviceAPITests(TestCase):
 class PrivateDeviceApiTests(TestCase):
     """Test authenticated API requests."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user@example.com', password='test123')
+        cls._client = APIClient()
+        cls._client.force_authenticate(cls.user)
+
     def setUp(self):
-        self.client = APIClient()
-        self.user = create_user(email='user@example.com', password='test123')
-        self.client.force_authenticate(self.user)
+        self.client = self.__class__._client
+        cache.clear()
 
     def test_retrieve_devices(self):
         """Test retrieving a list of devices."""
-        create_device(user=self.user)
-        create_device(user=self.user)
+        create_devices(user=self.user, n=2)
 
-        res = self.client.get(DEVICES_URL)
+        with self.assertNumQueries(3):
+            res = self.client.get(DEVICES_URL)
 
-        devices = Device.objects.all().order_by('-id')
-        serializer = DeviceSerializer(devices, many=True)
+        devices = Device.objects.order_by('-id')
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(
+            [device['id'] for device in res.data['results']],
+            list(devices.values_list('id', flat=True)),
+        )
 
     def test_device_list_limited_to_user(self):
         """Test list of devices is limited to authenticated user."""
@@ -99,17 +163,88 @@ class PrivateDeviceApiTests(TestCase):
 
         res = self.client.get(DEVICES_URL)
 
-        devices = Device.objects.filter(user=self.user)
-        serializer = DeviceSerializer(devices, many=True)
+        devices = Device.objects.filter(user=self.user).order_by('-id')
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(
+            [device['id'] for device in res.data['results']],
+            list(devices.values_list('id', flat=True)),
+        )
+
+    def test_device_list_paginated(self):
+        """Test the device list is returned in cursor pages."""
+        create_devices(user=self.user, n=3)
+
+        with patch.object(DeviceCursorPagination, 'page_size', 2):
+            res1 = self.client.get(DEVICES_URL)
+            res2 = self.client.get(res1.data['next'])
+
+        ids = list(
+            Device.objects.order_by('-id').values_list('id', flat=True)
+        )
+        self.assertEqual([d['id'] for d in res1.data['results']], ids[:2])
+        self.assertEqual([d['id'] for d in res2.data['results']], ids[2:])
+        self.assertIsNone(res2.data['next'])
+
+    @override_settings(ALLOWED_HOSTS=['one.example.com', 'two.example.com'])
+    def test_device_list_cached_per_host(self):
+        """Test cached pages keep page links on the requested host."""
+        create_devices(user=self.user, n=3)
+
+        with patch.object(DeviceCursorPagination, 'page_size', 2):
+            self.client.get(DEVICES_URL, HTTP_HOST='one.example.com')
+            res = self.client.get(DEVICES_URL, HTTP_HOST='two.example.com')
+
+        self.assertTrue(
+            res.data['next'].startswith('http://two.example.com/'),
+        )
+
+    def test_device_list_skips_detail_columns(self):
+        """Test the list query does not load detail-only columns."""
+        create_device(user=self.user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(DEVICES_URL)
+
+        device_sql = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT "core_device"')
+        ]
+        self.assertEqual(len(device_sql), 1)
+        self.assertNotIn('"description"', device_sql[0])
+        self.assertNotIn('"image"', device_sql[0])
+
+    def test_device_list_cached(self):
+        """Test repeating a list request reuses the cached page."""
+        create_devices(user=self.user, n=2)
+        res1 = self.client.get(DEVICES_URL)
+
+        with self.assertNumQueries(0):
+            res2 = self.client.get(DEVICES_URL)
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res1.data, res2.data)
+
+    def test_create_device_bumps_data_version_once(self):
+        """Test one device write updates the owner's data version once."""
+        payload = {**NEW_TAGS_PAYLOAD, **NEW_SENSORS_PAYLOAD}
+
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(DEVICES_URL, payload, format='json')
+
+        updates = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE "core_user"')
+        ]
+        self.assertEqual(len(updates), 1)
 
     def test_get_device_detail(self):
         """Test get device detail."""
         device = create_device(user=self.user)
 
         url = detail_url(device.id)
-        res = self.client.get(url)
+        with self.assertNumQueries(3):
+            res = self.client.get(url)
 
         serializer = DeviceDetailSerializer(device)
         self.assertEqual(res.data, serializer.data)
@@ -119,7 +254,7 @@ class PrivateDeviceApiTests(TestCase):
         payload = {
             'title': 'Sample device',
             'time_minutes': 30,
-            'value': Decimal('5.99'),
+            'value': VALUE_5_99,
         }
         res = self.client.post(DEVICES_URL, payload)
 
@@ -162,7 +297,7 @@ class PrivateDeviceApiTests(TestCase):
             'link': 'https://example.com/new-device.pdf',
             'description': 'New device description',
             'time_minutes': 10,
-            'value': Decimal('2.50'),
+            'value': VALUE_2_50,
         }
         url = detail_url(device.id)
         res = self.client.put(url, payload)
@@ -208,25 +343,45 @@ class PrivateDeviceApiTests(TestCase):
 
     def test_create_device_with_new_tags(self):
         """Test creating a device with new tags."""
-        payload = {
-            'title': 'DX',
-            'time_minutes': 30,
-            'value': Decimal('2.50'),
-            'tags': [{'name': 'Cooling device'}, {'name': 'small_unit'}],
-        }
-        res = self.client.post(DEVICES_URL, payload, format='json')
+        payload = NEW_TAGS_PAYLOAD
+        res = self.client.post(
+            DEVICES_URL,
+            NEW_TAGS_JSON,
+            content_type='application/json',
+        )
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         devices = Device.objects.filter(user=self.user)
         self.assertEqual(devices.count(), 1)
         device = devices[0]
         self.assertEqual(device.tags.count(), 2)
-        for tag in payload['tags']:
-            exists = device.tags.filter(
-                name=tag['name'],
-                user=self.user,
-            ).exists()
-            self.assertTrue(exists)
+        expected = {tag['name'] for tag in payload['tags']}
+        actual = set(
+            device.tags.filter(user=self.user).values_list('name', flat=True)
+        )
+        self.assertTrue(expected.issubset(actual))
+
+    def test_create_device_with_tags_sends_m2m_changed(self):
+        """Test adding tags on create notifies m2m_changed receivers."""
+        receiver = Mock()
+        m2m_changed.connect(receiver, sender=Device.tags.through)
+        self.addCleanup(
+            m2m_changed.disconnect, receiver, sender=Device.tags.through,
+        )
+
+        res = self.client.post(
+            DEVICES_URL,
+            NEW_TAGS_JSON,
+            content_type='application/json',
+        )
+
+        device = Device.objects.get(id=res.data['id'])
+        actions = [c.kwargs['action'] for c in receiver.call_args_list]
+        self.assertEqual(actions, ['pre_add', 'post_add'])
+        self.assertEqual(
+            receiver.call_args.kwargs['pk_set'],
+            set(device.tags.values_list('id', flat=True)),
+        )
 
     def test_create_device_with_existing_tags(self):
         """Test creating a device with existing tag."""
@@ -234,7 +389,7 @@ class PrivateDeviceApiTests(TestCase):
         payload = {
             'title': 'unknown device',
             'time_minutes': 60,
-            'value': Decimal('4.50'),
+            'value': VALUE_4_50,
             'tags': [{'name': 'meter'}, {'name': 'small_unit'}],
         }
         res = self.client.post(DEVICES_URL, payload, format='json')
@@ -245,12 +400,11 @@ class PrivateDeviceApiTests(TestCase):
         device = devices[0]
         self.assertEqual(device.tags.count(), 2)
         self.assertIn(tag_meter, device.tags.all())
-        for tag in payload['tags']:
-            exists = device.tags.filter(
-                name=tag['name'],
-                user=self.user,
-            ).exists()
-            self.assertTrue(exists)
+        expected = {tag['name'] for tag in payload['tags']}
+        actual = set(
+            device.tags.filter(user=self.user).values_list('name', flat=True)
+        )
+        self.assertTrue(expected.issubset(actual))
 
     def test_update_device_assign_tag(self):
         """Test assigning an existing tag when updating a device."""
@@ -267,6 +421,22 @@ class PrivateDeviceApiTests(TestCase):
         self.assertIn(tag_large_unit, device.tags.all())
         self.assertNotIn(tag_small_unit, device.tags.all())
 
+    def test_update_device_tags_only_skips_device_save(self):
+        """Test updating only tags does not write the device row."""
+        device = create_device(user=self.user)
+
+        payload = {'tags': [{'name': 'small_unit'}]}
+        url = detail_url(device.id)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        updates = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE "core_device"')
+        ]
+        self.assertEqual(updates, [])
+
     def test_clear_device_tags(self):
         """Test clearing a devices tags."""
         tag = Tag.objects.create(user=self.user, name='small_unit')
@@ -282,25 +452,25 @@ class PrivateDeviceApiTests(TestCase):
 
     def test_create_device_with_new_sensors(self):
         """Test creating a device with new sensors."""
-        payload = {
-            'title': 'AHU',
-            'time_minutes': 60,
-            'value': Decimal('4.30'),
-            'sensors': [{'name': 'temp'}, {'name': 'humidity'}],
-        }
-        res = self.client.post(DEVICES_URL, payload, format='json')
+        payload = NEW_SENSORS_PAYLOAD
+        res = self.client.post(
+            DEVICES_URL,
+            NEW_SENSORS_JSON,
+            content_type='application/json',
+        )
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         devices = Device.objects.filter(user=self.user)
         self.assertEqual(devices.count(), 1)
         device = devices[0]
         self.assertEqual(device.sensors.count(), 2)
-        for sensor in payload['sensors']:
-            exists = device.sensors.filter(
-                name=sensor['name'],
+        expected = {sensor['name'] for sensor in payload['sensors']}
+        actual = set(
+            device.sensors.filter(
                 user=self.user,
-            ).exists()
-            self.assertTrue(exists)
+            ).values_list('name', flat=True)
+        )
+        self.assertTrue(expected.issubset(actual))
 
     def test_create_device_with_existing_sensor(self):
         """Test creating a new device with existing sensor."""
@@ -319,12 +489,13 @@ class PrivateDeviceApiTests(TestCase):
         device = devices[0]
         self.assertEqual(device.sensors.count(), 2)
         self.assertIn(sensor, device.sensors.all())
-        for sensor in payload['sensors']:
-            exists = device.sensors.filter(
-                name=sensor['name'],
+        expected = {sensor['name'] for sensor in payload['sensors']}
+        actual = set(
+            device.sensors.filter(
                 user=self.user,
-            ).exists()
-            self.assertTrue(exists)
+            ).values_list('name', flat=True)
+        )
+        self.assertTrue(expected.issubset(actual))
 
     def test_create_sensor_on_update(self):
         """Test creating an sensor when updating a device."""
@@ -382,9 +553,33 @@ class PrivateDeviceApiTests(TestCase):
         s1 = DeviceSerializer(r1)
         s2 = DeviceSerializer(r2)
         s3 = DeviceSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_by_tags_unique(self):
+        """Test a device matching several filter tags is listed once."""
+        device = create_device(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='cooling_device1')
+        tag2 = Tag.objects.create(user=self.user, name='cooling_device2')
+        device.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        res = self.client.get(DEVICES_URL, params)
+
+        self.assertEqual([d['id'] for d in res.data['results']], [device.id])
+
+    def test_filter_by_tags_invalid_ids_ignored(self):
+        """Test empty and non-numeric tag ids are ignored."""
+        device = create_device(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='cooling_device1')
+        device.tags.add(tag)
+
+        params = {'tags': f'{tag.id},,abc,\u00b2,{tag.id}'}
+        res = self.client.get(DEVICES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([d['id'] for d in res.data['results']], [device.id])
 
     def test_filter_by_sensors(self):
         """Test filtering devices by sensors."""
@@ -402,41 +597,125 @@ class PrivateDeviceApiTests(TestCase):
         s1 = DeviceSerializer(r1)
         s2 = DeviceSerializer(r2)
         s3 = DeviceSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
+    def test_filter_by_single_sensor(self):
+        """Test filtering devices by a single sensor id."""
+        r1 = create_device(user=self.user, title='AHU')
+        create_device(user=self.user, title='Fan')
+        sensor = Sensor.objects.create(user=self.user, name='temp')
+        r1.sensors.add(sensor)
+
+        res = self.client.get(DEVICES_URL, {'sensors': str(sensor.id)})
+
+        self.assertEqual([d['id'] for d in res.data['results']], [r1.id])
 
-class ImageUploadTests(TestCase):
-    """Tests for the image upload API."""
+
+class DeviceListCacheTests(TransactionTestCase):
+    """Test cached device lists follow committed changes."""
 
     def setUp(self):
+        cache.clear()
+        self.user = create_user(email='user@example.com', password='test123')
+        token = Token.objects.create(user=self.user)
         self.client = APIClient()
-        self.user = get_user_model().objects.create_user(
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_device_list_cache_invalidated(self):
+        """Test changes to devices and tags show up in a cached list."""
+        device = create_device(user=self.user)
+        self.client.get(DEVICES_URL)
+
+        self.client.patch(
+            detail_url(device.id),
+            {'tags': [{'name': 'Cooling'}]},
+            format='json',
+        )
+        tag = Tag.objects.get(user=self.user)
+        self.client.patch(
+            reverse('device:tag-detail', args=[tag.id]),
+            {'name': 'Heating'},
+        )
+        res = self.client.get(DEVICES_URL)
+
+        self.assertEqual(
+            res.data['results'][0]['tags'],
+            [{'id': tag.id, 'name': 'Heating'}],
+        )
+
+        create_device(user=self.user, title='Second device')
+        res = self.client.get(DEVICES_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
+
+
+class ImageUploadTests(TestCase):
+    """Tests for the image upload API."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             'user@example.com',
             'password123',
         )
-        self.client.force_authenticate(self.user)
-        self.device = create_device(user=self.user)
+        cls.device = create_device(user=cls.user)
+        cls._client = APIClient()
+        cls._client.force_authenticate(cls.user)
 
-    def tearDown(self):
-        self.device.image.delete()
+    def setUp(self):
+        self.client = self.__class__._client
+        cache.clear()
 
     def test_upload_image(self):
         """Test uploading an image to a device."""
         url = image_upload_url(self.device.id)
-        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
-            img = Image.new('RGB', (10, 10))
-            img.save(image_file, format='JPEG')
-            image_file.seek(0)
-            payload = {'image': image_file}
-            res = self.client.post(url, payload, format='multipart')
+        image_file = io.BytesIO()
+        Image.new('RGB', (1, 1)).save(image_file, format='JPEG')
+        image_file.seek(0)
+        image_file.name = 'image.jpg'
+        payload = {'image': image_file}
+        res = self.client.post(url, payload, format='multipart')
 
         self.device.refresh_from_db()
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.device.image.path))
 
+    def test_upload_image_spooled_to_temporary_file(self):
+        """Test uploaded images are written to a temporary file."""
+        url = image_upload_url(self.device.id)
+        image_file = io.BytesIO()
+        Image.new('RGB', (1, 1)).save(image_file, format='JPEG')
+        image_file.seek(0)
+        image_file.name = 'image.jpg'
+
+        with patch.object(
+            DeviceImageSerializer,
+            'update',
+            autospec=True,
+            side_effect=lambda serializer, instance, data: instance,
+        ) as update:
+            res = self.client.post(url, {'image': image_file})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        validated_data = update.call_args[0][2]
+        self.assertIsInstance(validated_data['image'], TemporaryUploadedFile)
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image."""
         url = image_upload_url(self.device.id)
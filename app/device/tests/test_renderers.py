@@ -0,0 +1,61 @@
+"""
+Tests for device renderers.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from device.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """Test the orjson backed renderer."""
+
+    def test_matches_json_renderer(self):
+        """Test output is identical to the DRF JSON renderer."""
+        data = [
+            OrderedDict([
+                ('id', 1),
+                ('title', 'Kühler\u2028unit\u2029'),
+                ('value', Decimal('2.50')),
+                ('tags', [OrderedDict([('id', 2), ('name', 'cooling')])]),
+                ('link', None),
+            ]),
+        ]
+
+        self.assertEqual(
+            ORJSONRenderer().render(data),
+            JSONRenderer().render(data),
+        )
+
+    def test_indent_falls_back_to_json_renderer(self):
+        """Test indented output is rendered by the DRF JSON renderer."""
+        data = {'id': 1}
+        context = {'indent': 4}
+
+        self.assertEqual(
+            ORJSONRenderer().render(data, renderer_context=context),
+            JSONRenderer().render(data, renderer_context=context),
+        )
+
+    def test_non_finite_float_handled_by_json_renderer(self):
+        """Test NaN is rejected like the DRF JSON renderer does."""
+        data = {'id': 1, 'values': [1.5, float('nan')]}
+
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+        with self.assertRaises(ValueError):
+            ORJSONRenderer().render(data)
+
+    def test_ascii_output_falls_back_to_json_renderer(self):
+        """Test non-default JSON settings are rendered by JSONRenderer."""
+        data = {'title': 'Kühler'}
+        renderer = ORJSONRenderer()
+        renderer.ensure_ascii = True
+        expected = JSONRenderer()
+        expected.ensure_ascii = True
+
+        self.assertEqual(renderer.render(data), expected.render(data))
+        self.assertIn(b'\\u00fc', renderer.render(data))
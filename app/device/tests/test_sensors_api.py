@@ -2,9 +2,12 @@
 Tests for the sensors API.
 """
 from decimal import Decimal
+from functools import lru_cache
+
 from django.contrib.auth import get_user_model
-from django.urls import reverse
-from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse, reverse_lazy
+from django.test import SimpleTestCase, TestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -17,12 +20,19 @@ from core.models import (
 from device.serializers import SensorSerializer
 
 
-SENSORS_URL = reverse('device:sensor-list')
+SENSORS_URL = reverse_lazy('device:sensor-list')
+DEVICES_URL = reverse_lazy('device:device-list')
+
+
+@lru_cache(maxsize=None)
+def url_template(name):
+    """Return a format string for the named URL taking one id."""
+    return reverse(name, args=[0]).replace('/0/', '/{}/')
 
 
 def detail_url(sensor_id):
     """Create and return an sensor detail URL."""
-    return reverse('device:sensor-detail', args=[sensor_id])
+    return url_template('device:sensor-detail').format(sensor_id)
 
 
 def create_user(email='user@example.com', password='testpass123'):
@@ -30,7 +40,21 @@ def create_user(email='user@example.com', password='testpass123'):
     return get_user_model().objects.create_user(email=email, password=password)
 
 
-class PublicSensorsApiTests(TestCase):
+def create_sensors(user, names):
+    """Create and return sensors with the given names in a single query."""
+    return Sensor.objects.bulk_create(
+        [Sensor(user=user, name=n) for n in names]
+    )
+
+
+def create_devices_from_specs(user, specs):
+    """Create and return devices from a list of field values."""
+    return Device.objects.bulk_create(
+        [Device(user=user, **spec) for spec in specs]
+    )
+
+
+class PublicSensorsApiTests(SimpleTestCase):
     """Test unauthenticated API requests."""
 
     def setUp(self):
@@ -46,22 +70,29 @@ class PublicSensorsApiTests(TestCase):
 class PrivatesSensorsApiTests(TestCase):
     """Test authenticated API requests."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls._client = APIClient()
+        cls._client.force_authenticate(cls.user)
+
     def setUp(self):
-        self.user = create_user()
-        self.client = APIClient()
-        self.client.force_authenticate(self.user)
+        self.client = self.__class__._client
+        cache.clear()
 
     def test_retrieve_sensors(self):
         """Test retrieving a list of sensors."""
-        Sensor.objects.create(user=self.user, name='temp')
-        Sensor.objects.create(user=self.user, name='humidity')
+        create_sensors(self.user, ['temp', 'humidity'])
 
-        res = self.client.get(SENSORS_URL)
+        with self.assertNumQueries(1):
+            res = self.client.get(SENSORS_URL)
 
         sensors = Sensor.objects.all().order_by('-name')
-        serializer = SensorSerializer(sensors, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(
+            [sensor['id'] for sensor in res.data],
+            list(sensors.values_list('id', flat=True)),
+        )
 
     def test_sensors_limited_to_user(self):
         """Test list of sensors is limited to authenticated user."""
@@ -88,6 +119,19 @@ class PrivatesSensorsApiTests(TestCase):
         sensor.refresh_from_db()
         self.assertEqual(sensor.name, payload['name'])
 
+    def test_update_sensor_duplicate_name_error(self):
+        """Test renaming a sensor to an existing name returns an error."""
+        Sensor.objects.create(user=self.user, name='temp')
+        sensor = Sensor.objects.create(user=self.user, name='humidity')
+
+        payload = {'name': 'temp'}
+        url = detail_url(sensor.id)
+        res = self.client.patch(url, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        sensor.refresh_from_db()
+        self.assertEqual(sensor.name, 'humidity')
+
     def test_delete_sensor(self):
         """Test deleting an sensor."""
         sensor = Sensor.objects.create(user=self.user, name='humidity')
@@ -101,8 +145,7 @@ class PrivatesSensorsApiTests(TestCase):
 
     def test_filter_sensors_assigned_to_devices(self):
         """Test listing sensors to those assigned to devices."""
-        se1 = Sensor.objects.create(user=self.user, name='temp')
-        se2 = Sensor.objects.create(user=self.user, name='humd')
+        se1, se2 = create_sensors(self.user, ['temp', 'humd'])
         device = Device.objects.create(
             title='AHU',
             time_minutes=5,
@@ -118,22 +161,27 @@ class PrivatesSensorsApiTests(TestCase):
         self.assertIn(s1.data, res.data)
         self.assertNotIn(s2.data, res.data)
 
+    def test_filter_sensors_assigned_on_device_create(self):
+        """Test sensors created with a device are listed as assigned."""
+        payload = {
+            'title': 'AHU',
+            'time_minutes': 10,
+            'value': '2.50',
+            'sensors': [{'name': 'temp'}],
+        }
+        self.client.post(DEVICES_URL, payload, format='json')
+
+        res = self.client.get(SENSORS_URL, {'assigned_only': 1})
+
+        self.assertEqual([sensor['name'] for sensor in res.data], ['temp'])
+
     def test_filtered_sensors_unique(self):
         """Test filtered sensors returns a unique list."""
-        se = Sensor.objects.create(user=self.user, name='temp')
-        Sensor.objects.create(user=self.user, name='light')
-        device1 = Device.objects.create(
-            title='AHU',
-            time_minutes=60,
-            value=Decimal('7.00'),
-            user=self.user,
-        )
-        device2 = Device.objects.create(
-            title='FAN',
-            time_minutes=20,
-            value=Decimal('4.00'),
-            user=self.user,
-        )
+        se, _ = create_sensors(self.user, ['temp', 'light'])
+        device1, device2 = create_devices_from_specs(self.user, [
+            {'title': 'AHU', 'time_minutes': 60, 'value': Decimal('7.00')},
+            {'title': 'FAN', 'time_minutes': 20, 'value': Decimal('4.00')},
+        ])
         device1.sensors.add(se)
         device2.sensors.add(se)
 
@@ -0,0 +1,81 @@
+"""
+Tests for device serializers.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from core.models import (
+    Device,
+    Tag,
+    Sensor,
+)
+
+from device.serializers import (
+    DeviceSerializer,
+    DeviceListSerializer,
+)
+
+
+class CachedFieldsTests(SimpleTestCase):
+    """Test serializer fields cached per class."""
+
+    def test_fields_not_shared_between_instances(self):
+        """Test each serializer instance binds its own field copies."""
+        s1 = DeviceSerializer()
+        s2 = DeviceSerializer()
+
+        self.assertEqual(list(s1.fields), list(s2.fields))
+        for name in s1.fields:
+            self.assertIsNot(s1.fields[name], s2.fields[name])
+            self.assertIs(s1.fields[name].parent, s1)
+            self.assertIs(s2.fields[name].parent, s2)
+        self.assertIsNot(s1.fields['tags'].child, s2.fields['tags'].child)
+
+
+class DeviceListSerializerTests(TestCase):
+    """Test the device list serializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        device = Device.objects.create(
+            user=user,
+            title='AHU',
+            time_minutes=5,
+            value=Decimal('2.50'),
+        )
+        device.tags.add(
+            Tag.objects.create(user=user, name='cooling'),
+            Tag.objects.create(user=user, name='large_unit'),
+        )
+        device.sensors.add(Sensor.objects.create(user=user, name='temp'))
+        Device.objects.create(
+            user=user,
+            title='DX',
+            time_minutes=10,
+            value=Decimal('4.50'),
+        )
+
+    def test_matches_device_serializer(self):
+        """Test list output matches the nested device serializer."""
+        devices = Device.objects.prefetch_related('tags', 'sensors')
+        s1 = DeviceListSerializer(devices, many=True)
+        s2 = DeviceSerializer(devices, many=True)
+
+        self.assertEqual(s1.data, s2.data)
+
+    def test_values_rows_match_device_serializer(self):
+        """Test list output from values() rows matches model instances."""
+        devices = Device.objects.order_by('id')
+        rows = devices.values('id', 'title', 'time_minutes', 'value', 'link')
+
+        with self.assertNumQueries(3):
+            s1 = DeviceListSerializer(rows, many=True).data
+        s2 = DeviceSerializer(devices, many=True).data
+
+        self.assertEqual(s1, s2)
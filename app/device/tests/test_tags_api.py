@@ -1,9 +1,12 @@
 """
 Tests for the tags API.
 """
+from functools import lru_cache
+
 from django.contrib.auth import get_user_model
-from django.urls import reverse
-from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse, reverse_lazy
+from django.test import SimpleTestCase, TestCase
 from decimal import Decimal
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -16,12 +19,19 @@ from core.models import (
 from device.serializers import TagSerializer
 
 
-TAGS_URL = reverse('device:tag-list')
+TAGS_URL = reverse_lazy('device:tag-list')
+DEVICES_URL = reverse_lazy('device:device-list')
+
+
+@lru_cache(maxsize=None)
+def url_template(name):
+    """Return a format string for the named URL taking one id."""
+    return reverse(name, args=[0]).replace('/0/', '/{}/')
 
 
 def detail_url(tag_id):
     """Create and return a tag detail url."""
-    return reverse('device:tag-detail', args=[tag_id])
+    return url_template('device:tag-detail').format(tag_id)
 
 
 def create_user(email='user@example.com', password='testpass123'):
@@ -29,7 +39,19 @@ def create_user(email='user@example.com', password='testpass123'):
     return get_user_model().objects.create_user(email=email, password=password)
 
 
-class PublicTagsApiTests(TestCase):
+def create_tags(user, names):
+    """Create and return tags with the given names in a single query."""
+    return Tag.objects.bulk_create([Tag(user=user, name=n) for n in names])
+
+
+def create_devices_from_specs(user, specs):
+    """Create and return devices from a list of field values."""
+    return Device.objects.bulk_create(
+        [Device(user=user, **spec) for spec in specs]
+    )
+
+
+class PublicTagsApiTests(SimpleTestCase):
     """Test unauthenticated API requests."""
 
     def setUp(self):
@@ -45,22 +67,29 @@ class PublicTagsApiTests(TestCase):
 class PrivateTagsApiTests(TestCase):
     """Test authenticated API requests."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls._client = APIClient()
+        cls._client.force_authenticate(cls.user)
+
     def setUp(self):
-        self.user = create_user()
-        self.client = APIClient()
-        self.client.force_authenticate(self.user)
+        self.client = self.__class__._client
+        cache.clear()
 
     def test_retrieve_tags(self):
         """Test retrieving a list of tags."""
-        Tag.objects.create(user=self.user, name='Vegan')
-        Tag.objects.create(user=self.user, name='Dessert')
+        create_tags(self.user, ['Vegan', 'Dessert'])
 
-        res = self.client.get(TAGS_URL)
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL)
 
         tags = Tag.objects.all().order_by('-name')
-        serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(
+            [tag['id'] for tag in res.data],
+            list(tags.values_list('id', flat=True)),
+        )
 
     def test_tags_limited_to_user(self):
         """Test list of tags is limited to authenticated user."""
@@ -87,6 +116,19 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name_error(self):
+        """Test renaming a tag to an existing name returns an error."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        payload = {'name': 'Dessert'}
+        url = detail_url(tag.id)
+        res = self.client.patch(url, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -100,8 +142,7 @@ class PrivateTagsApiTests(TestCase):
 
     def test_filter_tags_assigned_to_devices(self):
         """Test listing tags to those assigned to devices."""
-        tag1 = Tag.objects.create(user=self.user, name='small_unit')
-        tag2 = Tag.objects.create(user=self.user, name='large_unit')
+        tag1, tag2 = create_tags(self.user, ['small_unit', 'large_unit'])
         device = Device.objects.create(
             title='AHU',
             time_minutes=10,
@@ -117,22 +158,27 @@ class PrivateTagsApiTests(TestCase):
         self.assertIn(s1.data, res.data)
         self.assertNotIn(s2.data, res.data)
 
+    def test_filter_tags_assigned_on_device_create(self):
+        """Test tags created with a device are listed as assigned."""
+        payload = {
+            'title': 'AHU',
+            'time_minutes': 10,
+            'value': '2.50',
+            'tags': [{'name': 'small_unit'}],
+        }
+        self.client.post(DEVICES_URL, payload, format='json')
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['small_unit'])
+
     def test_filtered_tags_unique(self):
         """Test filtered tags returns a unique list."""
-        tag = Tag.objects.create(user=self.user, name='small_unit')
-        Tag.objects.create(user=self.user, name='large_unit')
-        device1 = Device.objects.create(
-            title='AHU',
-            time_minutes=5,
-            value=Decimal('5.00'),
-            user=self.user,
-        )
-        device2 = Device.objects.create(
-            title='Fan',
-            time_minutes=3,
-            value=Decimal('2.00'),
-            user=self.user,
-        )
+        tag, _ = create_tags(self.user, ['small_unit', 'large_unit'])
+        device1, device2 = create_devices_from_specs(self.user, [
+            {'title': 'AHU', 'time_minutes': 5, 'value': Decimal('5.00')},
+            {'title': 'Fan', 'time_minutes': 3, 'value': Decimal('2.00')},
+        ])
         device1.tags.add(tag)
         device2.tags.add(tag)
 
@@ -1,7 +1,20 @@
 """
 Views for the device APIs
 """
+import hashlib
 
+from django.core.cache import cache
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import (
+    IntegrityError,
+    transaction,
+)
+from django.db.models import (
+    Exists,
+    OuterRef,
+    Prefetch,
+    Q,
+)
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -14,8 +27,10 @@ from rest_framework import (
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 
 from core.models import (
@@ -24,6 +39,32 @@ from core.models import (
     Sensor,
 )
 from device import serializers
+from device.pagination import DeviceCursorPagination
+from device.renderers import ORJSONRenderer
+
+
+class CachedListMixin:
+    """Serve list responses from the cache until the user's data changes."""
+    list_cache_timeout = 300
+
+    def list_cache_key(self, request):
+        """Return the cache key for a list request."""
+        # Token authentication loads the user row on every request, so
+        # the version is current without another query.
+        user = request.user
+        raw = f'{user.pk}:{user.data_version}:{request.build_absolute_uri()}'
+
+        return 'list:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def list(self, request, *args, **kwargs):
+        """List objects, reusing the cached page when possible."""
+        key = self.list_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, self.list_cache_timeout)
+
+        return Response(data)
 
 
 @extend_schema_view(
@@ -42,49 +83,108 @@ from device import serializers
         ]
     )
 )
-class DeviceViewSet(viewsets.ModelViewSet):
+class DeviceViewSet(CachedListMixin, viewsets.ModelViewSet):
     """View for manage device APIs."""
     serializer_class = serializers.DeviceDetailSerializer
+    serializer_classes = {
+        'list': serializers.DeviceListSerializer,
+        'upload_image': serializers.DeviceImageSerializer,
+    }
     queryset = Device.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
-
-    def _params_to_ints(self, qs):
-        """Convert a list of strings to integers."""
-        return [int(str_id) for str_id in qs.split(',')]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+    pagination_class = DeviceCursorPagination
+
+    @staticmethod
+    def _params_to_ints(qs):
+        """Convert a list of strings to unique integers, skipping bad ids."""
+        return list(dict.fromkeys(
+            int(str_id) for str_id in qs.split(',') if str_id.isdecimal()
+        ))
+
+    @staticmethod
+    def _ids_lookup(field, ids):
+        """Return filter kwargs matching ids, using equality for one id."""
+        if len(ids) == 1:
+            return {field: ids[0]}
+        return {f'{field}__in': ids}
+
+    def _list_only_fields(self):
+        """Return the concrete device fields the list serializer reads."""
+        return [
+            name for name in self.get_serializer_class().Meta.fields
+            if not Device._meta.get_field(name).many_to_many
+        ]
 
     def get_queryset(self):
         """Retrieve devices for authenticated user."""
+        if getattr(self, '_queryset', None) is None:
+            self._queryset = self._build_queryset()
+
+        return self._queryset.all()
+
+    def _build_queryset(self):
+        """Build the device queryset for the current request."""
         tags = self.request.query_params.get('tags')
         sensors = self.request.query_params.get('sensors')
-        queryset = self.queryset
+        conditions = [Q(user=self.request.user)]
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            conditions.append(Exists(
+                Device.tags.through.objects.filter(
+                    device_id=OuterRef('pk'),
+                    **self._ids_lookup('tag_id', tag_ids),
+                )
+            ))
         if sensors:
             sensor_ids = self._params_to_ints(sensors)
-            queryset = queryset.filter(sensors__id__in=sensor_ids)
+            conditions.append(Exists(
+                Device.sensors.through.objects.filter(
+                    device_id=OuterRef('pk'),
+                    **self._ids_lookup('sensor_id', sensor_ids),
+                )
+            ))
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        queryset = self.queryset.filter(*conditions).order_by('-id')
 
-    def get_serializer_class(self):
-        """Return the serializer class for request."""
         if self.action == 'list':
-            return serializers.DeviceSerializer
-        elif self.action == 'upload_image':
-            return serializers.DeviceImageSerializer
+            # Rows are rendered by the list serializer, which loads tags
+            # and sensors itself.
+            return queryset.values(*self._list_only_fields())
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only('id', 'name')),
+                Prefetch(
+                    'sensors',
+                    queryset=Sensor.objects.only('id', 'name'),
+                ),
+            )
+
+        return queryset
 
-        return self.serializer_class
+    def get_serializer_class(self):
+        """Return the serializer class for request."""
+        return self.serializer_classes.get(self.action, self.serializer_class)
 
     def perform_create(self, serializer):
         """Create a new device."""
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """Update a device and its tags and sensors together."""
+        with transaction.atomic():
+            serializer.save()
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to device."""
+        # Spool the upload to a temporary file instead of holding it in
+        # memory; must be set before request.data is parsed.
+        request._request.upload_handlers = [
+            TemporaryFileUploadHandler(request._request),
+        ]
         device = self.get_object()
         serializer = self.get_serializer(device, data=request.data)
 
@@ -106,13 +206,15 @@ class DeviceViewSet(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseDeviceAttrViewSet(mixins.DestroyModelMixin,
+class BaseDeviceAttrViewSet(CachedListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for device attributes."""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
@@ -121,11 +223,19 @@ class BaseDeviceAttrViewSet(mixins.DestroyModelMixin,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(device__isnull=False)
+            queryset = queryset.filter(assigned=True)
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name')
+
+    def perform_update(self, serializer):
+        """Update an item, rejecting names the user already has."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name': ['This name is already in use.']})
 
 
 class TagViewSet(BaseDeviceAttrViewSet):